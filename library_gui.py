@@ -6,9 +6,11 @@ using tkinter. It provides functionality for managing books, borrowing, and retu
 """
 
 # Standard library imports
+import argparse
 import csv
 import json
 import os
+import threading
 from datetime import datetime, timedelta
 
 # Third-party imports
@@ -17,6 +19,11 @@ from tkinter import ttk, messagebox, filedialog
 from tkinter.font import Font
 import tkinter.font as tkfont
 
+# Local imports
+import overdue_notices
+import query_cache
+import replication
+
 # Global variables
 books = []
 borrowed_books = []
@@ -24,6 +31,20 @@ app = None
 tree = None
 content_frame = None
 main_container = None
+status_label = None
+cache_label = None
+refresh_view = None
+
+# Replication
+mutation_log = None
+shippers = []
+replica = None
+replica_updated_at = None
+REPLICA_POLL_MS = 2000
+
+# Cache of derived view rows
+cache = None
+CACHE_STATS_MS = 1000
 
 # Style variables
 primary_color = "#2c3e50"    # Dark blue
@@ -114,6 +135,12 @@ def configure_styles():
               background=[('active', '#c0392b')],  # Darker red on hover
               foreground=[('active', 'white')])
 
+    # Status bar style
+    style.configure('Status.TLabel',
+                   font=text_font,
+                   background=bg_color,
+                   foreground=text_color)
+
 def create_header():
     """Create the application header with gradient effect"""
     header_frame = tk.Frame(app, height=60, bg=primary_color)
@@ -129,14 +156,20 @@ def create_sidebar():
     sidebar = ttk.Frame(main_container, style='Sidebar.TFrame')
     sidebar.pack(side="left", fill="y", padx=0, pady=0)
 
-    buttons = [
-        ("📚 View Books", show_books_view),
-        ("➕ Add Book", show_add_book_view),
-        ("📖 Borrow Book", show_borrow_view),
-        ("↩️ Return Book", show_return_view),
-        ("📋 Borrowed Books", show_borrowed_books_view),
-        ("⏰ Overdue Books", show_overdue_view)
-    ]
+    if replica:
+        buttons = [
+            ("📚 View Books", show_books_view),
+            ("⏰ Overdue Books", show_overdue_view)
+        ]
+    else:
+        buttons = [
+            ("📚 View Books", show_books_view),
+            ("➕ Add Book", show_add_book_view),
+            ("📖 Borrow Book", show_borrow_view),
+            ("↩️ Return Book", show_return_view),
+            ("📋 Borrowed Books", show_borrowed_books_view),
+            ("⏰ Overdue Books", show_overdue_view)
+        ]
 
     for text, command in buttons:
         btn = ttk.Button(sidebar, text=text, command=command, style='Sidebar.TButton')
@@ -144,6 +177,8 @@ def create_sidebar():
 
 def clear_content():
     """Clear all widgets from the content frame"""
+    global refresh_view
+    refresh_view = None
     for widget in content_frame.winfo_children():
         widget.destroy()
 
@@ -159,8 +194,13 @@ def validate_year_input(value):
         return False
 
 def load_data():
-    """Load books and borrowed books data from JSON files"""
-    global books, borrowed_books
+    """Load books and borrowed books data from JSON files and the mutation log"""
+    global books, borrowed_books, mutation_log
+    if replica:
+        # Start from the replica's saved state; new entries arrive by polling
+        books = list(replica.books.values())
+        borrowed_books = list(replica.borrowed_books.values())
+        return
     try:
         if os.path.exists('books.json'):
             with open('books.json', 'r') as f:
@@ -168,9 +208,92 @@ def load_data():
         if os.path.exists('borrowed_books.json'):
             with open('borrowed_books.json', 'r') as f:
                 borrowed_books = json.load(f)
+        # Catch up with changes that were logged but not saved, and
+        # snapshot the catalog so new replicas can start from here
+        saved = (books, borrowed_books)
+        mutation_log, books, borrowed_books = replication.open_primary(books, borrowed_books)
+        if (books, borrowed_books) != saved:
+            save_data()
+        ship_mutations()
     except Exception as e:
         messagebox.showerror("Error", f"Failed to load data: {str(e)}")
 
+def poll_replica():
+    """Fetch new log entries in the background so the window stays responsive"""
+    def fetch():
+        try:
+            fetched, error = replica.fetch(), None
+        except Exception as e:
+            fetched, error = None, e
+        app.after(0, lambda: apply_replica_update(fetched, error))
+
+    threading.Thread(target=fetch, daemon=True).start()
+
+def apply_replica_update(fetched, error):
+    """Apply fetched entries on the GUI thread and schedule the next poll"""
+    global books, borrowed_books
+    if error:
+        # Keep serving the last applied state until the primary is back
+        status_label.configure(text=f"Primary unavailable ({error}); showing data as of "
+                                    f"{replica_updated_at or 'last start'}")
+    else:
+        try:
+            applied = replica.apply(*fetched)
+            if applied or fetched[0]:
+                books = list(replica.books.values())
+                borrowed_books = list(replica.borrowed_books.values())
+                if refresh_view:
+                    refresh_view()
+            set_replica_updated()
+        except Exception as e:
+            status_label.configure(text=f"Failed to update replica: {str(e)}")
+    app.after(REPLICA_POLL_MS, poll_replica)
+
+def set_replica_updated():
+    """Show when the replica last caught up with the primary"""
+    global replica_updated_at
+    replica_updated_at = datetime.now().strftime('%H:%M:%S')
+    status_label.configure(text=f"Read-only copy, up to date as of {replica_updated_at}")
+
+def update_cache_stats():
+    """Show the query cache counters in the status bar"""
+    stats = cache.stats()
+    cache_label.configure(text=(
+        f"Cache: {stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['evictions']} evictions, {stats['entries']} entries, "
+        f"{stats['bytes'] / 1024:.1f} KB of {stats['max_bytes'] / (1024 * 1024):.1f} MB"))
+    app.after(CACHE_STATS_MS, update_cache_stats)
+
+def tag_status_colors(tree):
+    """Color table rows by the status tag they are inserted with"""
+    for status in ("Available", "On Time"):
+        tree.tag_configure(status, foreground=success_color)
+    for status in ("Borrowed", "Overdue"):
+        tree.tag_configure(status, foreground=accent_color)
+
+def record_mutation(op, data):
+    """Append a mutation to the log before it is saved
+
+    Returns False if the change could not be logged; the caller must then
+    drop it, or replicas would never receive it.
+    """
+    if mutation_log:
+        try:
+            mutation_log.append(op, data)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to log change, nothing was saved: {str(e)}")
+            return False
+    cache.invalidate({'op': op, 'data': data})
+    return True
+
+def ship_mutations():
+    """Ship new log entries to every replica directory"""
+    for shipper in shippers:
+        try:
+            shipper.ship()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to ship to '{shipper.directory}': {str(e)}")
+
 def save_data():
     """Save books and borrowed books data to JSON files"""
     try:
@@ -179,14 +302,18 @@ def save_data():
         with open('borrowed_books.json', 'w') as f:
             json.dump(borrowed_books, f, indent=4)
     except Exception as e:
-        messagebox.showerror("Error", f"Failed to save data: {str(e)}")
+        # The change is already in the mutation log, which replicas follow
+        # and the next start replays, so shipping it keeps them in step
+        messagebox.showerror("Error", f"Failed to save data: {str(e)}\n"
+                             "The change is kept in the mutation log and saved on the next start.")
+    ship_mutations()
 
 def initialize_gui():
     """Initialize the main GUI window and setup"""
-    global app, main_container, content_frame
+    global app, main_container, content_frame, status_label, cache_label
     
     app = tk.Tk()
-    app.title("Library Management System")
+    app.title("Library Management System (Read-only)" if replica else "Library Management System")
     app.geometry("1200x700")
     
     setup_fonts()
@@ -195,6 +322,13 @@ def initialize_gui():
     app.configure(bg=bg_color)
     create_header()
 
+    status_bar = ttk.Frame(app, style='Main.TFrame')
+    status_bar.pack(side='bottom', fill='x', padx=20, pady=(0, 5))
+    status_label = ttk.Label(status_bar, style='Status.TLabel')
+    status_label.pack(side='left')
+    cache_label = ttk.Label(status_bar, style='Status.TLabel')
+    cache_label.pack(side='right')
+
     main_container = ttk.Frame(app, style='Main.TFrame')
     main_container.pack(fill="both", expand=True, padx=20, pady=(0, 20))
 
@@ -203,12 +337,46 @@ def initialize_gui():
     content_frame.pack(side="right", fill="both", expand=True, padx=(20, 0))
 
     show_books_view()
+    update_cache_stats()
+
+    if replica:
+        status_label.configure(text="Read-only copy, connecting to primary...")
+        poll_replica()
+
+def parse_args():
+    """Parse the replication options from the command line"""
+    parser = argparse.ArgumentParser(description="Library Management System")
+    parser.add_argument('--ship-to', action='append', default=[], metavar='DIR',
+                        help="ship the mutation log to a replica directory")
+    parser.add_argument('--serve', metavar='HOST:PORT',
+                        help="serve the mutation log to replicas over TCP")
+    parser.add_argument('--replica', metavar='DIR',
+                        help="run as a read-only replica kept in this directory")
+    parser.add_argument('--primary', metavar='HOST:PORT',
+                        help="pull the replica from a primary's log server")
+    parser.add_argument('--cache-mb', type=float,
+                        default=query_cache.DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="memory budget for cached view data")
+    return parser.parse_args()
 
 def run():
     """Start the application"""
+    global replica, cache
+    args = parse_args()
+    cache = query_cache.QueryCache(int(args.cache_mb * 1024 * 1024))
+    if args.replica:
+        source = replication.parse_address(args.primary) if args.primary else None
+        replica = replication.Replica(args.replica, source, cache)
+    else:
+        shippers.extend(replication.DirectoryShipper(d) for d in args.ship_to)
     load_data()
+    if args.serve and not replica:
+        host, port = replication.parse_address(args.serve)
+        server = replication.LogServer(host=host, port=port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
     initialize_gui()
     app.mainloop()
+    print("Query cache: " + ", ".join(f"{name}={value}" for name, value in cache.stats().items()))
 
 def show_books_view():
     clear_content()
@@ -243,6 +411,7 @@ def show_books_view():
     columns = ('ID', 'Title', 'Author', 'Year', 'Status')
     global tree
     tree = ttk.Treeview(table_frame, columns=columns, show='headings', style='Custom.Treeview')
+    tag_status_colors(tree)
 
     for col in columns:
         tree.heading(col, text=col)
@@ -254,13 +423,8 @@ def show_books_view():
             tree.delete(item)
 
         # Filter and display books
-        for book in books:
-            if (search_term == "" or search_term.lower() in book['title'].lower() or 
-                search_term.lower() in book['author'].lower()):
-                status = "Available" if book['available'] else "Borrowed"
-                status_color = success_color if book['available'] else accent_color
-                tree.insert('', 'end', values=(book['id'], book['title'], book['author'], 
-                                        book['publication_year'], status))
+        for row in cache.search(books, search_term):
+            tree.insert('', 'end', values=row, tags=(row[4],))
 
     def on_search():
         search_term = search_entry.get()
@@ -268,6 +432,9 @@ def show_books_view():
             search_term = ""
         update_table(search_term)
 
+    global refresh_view
+    refresh_view = on_search
+
     # Search button
     search_btn = ttk.Button(search_frame, text="🔍 Search", command=on_search)
     search_btn.pack(side="left", padx=10)
@@ -292,11 +459,23 @@ def show_books_view():
     export_btn = ttk.Button(button_frame, text="Export to CSV", command=export_to_csv, style='Sidebar.TButton')
     export_btn.pack(side='right', padx=5)
 
+    # Add data table
+    tree.pack(side='left', fill='both', expand=True)
+    scrollbar.pack(side='right', fill='y')
+
+    # Initial table population
+    update_table()
+
+    # Replicas are read-only
+    if replica:
+        return
+
     # Add edit button
     edit_btn = ttk.Button(button_frame, text="Edit Book", command=show_edit_book_dialog, style='Sidebar.TButton')
     edit_btn.pack(side='left', padx=5)
 
     def delete_selected():
+        global books, borrowed_books
         selected_item = tree.selection()
         if not selected_item:
             messagebox.showwarning("Warning", "Please select a book to delete")
@@ -316,6 +495,9 @@ def show_books_view():
                                 "Cannot delete a borrowed book. Please wait for it to be returned.")
                 return
             
+            if not record_mutation('delete_book', {'id': book_id}):
+                return
+
             # Remove from books list
             books = [b for b in books if b['id'] != book_id]
             # Remove from borrowed_books if present
@@ -332,13 +514,6 @@ def show_books_view():
     delete_btn = ttk.Button(button_frame, text="🗑️ Delete Selected Book", 
                         command=delete_selected, style='Delete.TButton')
     delete_btn.pack(side='right', padx=5)
-    
-    # Pack elements
-    tree.pack(side='left', fill='both', expand=True)
-    scrollbar.pack(side='right', fill='y')
-
-    # Initial table population
-    update_table()
 
 def show_add_book_view():
     clear_content()
@@ -377,12 +552,14 @@ def show_add_book_view():
 
         if title and author and year:
             book = {
-                'id': len(books) + 1,
+                'id': max((b['id'] for b in books), default=0) + 1,
                 'title': title,
                 'author': author,
                 'publication_year': year,
                 'available': True
             }
+            if not record_mutation('add_book', book):
+                return
             books.append(book)
             save_data()
             messagebox.showinfo("Success", f"Book '{title}' added successfully!")
@@ -428,7 +605,6 @@ def show_borrow_view():
 
             for book in books:
                 if book['id'] == book_id and book['available']:
-                    book['available'] = False
                     borrow_date = datetime.now()
                     due_date = borrow_date + timedelta(days=14)
                     
@@ -440,6 +616,9 @@ def show_borrow_view():
                         'due_date': due_date.strftime('%Y-%m-%d')
                     }
                     
+                    if not record_mutation('borrow', borrowed_info):
+                        return
+                    book['available'] = False
                     borrowed_books.append(borrowed_info)
                     save_data()
                     messagebox.showinfo("Success", 
@@ -479,6 +658,8 @@ def show_return_view():
             
             for book in books:
                 if book['id'] == book_id and not book['available']:
+                    if not record_mutation('return', {'book_id': book_id}):
+                        return
                     book['available'] = True
                     global borrowed_books
                     borrowed_books = [b for b in borrowed_books if b['book_id'] != book_id]
@@ -516,18 +697,41 @@ def show_overdue_view():
     tree.configure(yscrollcommand=scrollbar.set)
 
     # Add data
-    today = datetime.now()
-    for borrowed in borrowed_books:
-        due_date = datetime.strptime(borrowed['due_date'], '%Y-%m-%d')
-        if today > due_date:
-            days_overdue = (today - due_date).days
-            tree.insert('', 'end', values=(borrowed['book_title'], borrowed['student_name'], 
-                                         borrowed['due_date'], f"{days_overdue} days"))
+    def update_table():
+        for item in tree.get_children():
+            tree.delete(item)
+        for book_id, book_title, student_name, due_date, days_overdue in cache.overdue(borrowed_books):
+            tree.insert('', 'end', values=(book_title, student_name, due_date, f"{days_overdue} days"))
+
+    update_table()
+    global refresh_view
+    refresh_view = update_table
 
     # Pack elements
     tree.pack(pady=20, padx=20, fill='both', expand=True, side='left')
     scrollbar.pack(pady=20, fill='y', side='right')
 
+    # Notices are produced by the primary only
+    if replica:
+        return
+
+    # Add notices button
+    def generate_notices():
+        try:
+            produced, skipped = overdue_notices.generate_notices(
+                borrowed_books, overdue_notices.DirectorySink(), workers=1)
+            messagebox.showinfo("Success",
+                f"Generated {produced} notices in '{overdue_notices.DEFAULT_OUTPUT_DIR}' "
+                f"({skipped} already generated).")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to generate notices: {str(e)}")
+
+    button_frame = ttk.Frame(content_frame, style='Content.TFrame')
+    button_frame.pack(fill='x', padx=20, pady=10, side='bottom', before=tree)
+
+    notices_btn = ttk.Button(button_frame, text="✉️ Generate Notices", command=generate_notices)
+    notices_btn.pack(side='right', padx=5)
+
 def show_borrowed_books_view():
     clear_content()
     
@@ -549,20 +753,9 @@ def show_borrowed_books_view():
         tree.column(col, width=130, anchor='center')
 
     # Add data
-    today = datetime.now()
-    for borrowed in borrowed_books:
-        due_date = datetime.strptime(borrowed['due_date'], '%Y-%m-%d')
-        status = "Overdue" if today > due_date else "On Time"
-        status_color = accent_color if status == "Overdue" else success_color
-        
-        tree.insert('', 'end', values=(
-            borrowed['book_id'],
-            borrowed['book_title'],
-            borrowed['student_name'],
-            borrowed['borrow_date'],
-            borrowed['due_date'],
-            status
-        ))
+    tag_status_colors(tree)
+    for row in cache.borrowed(borrowed_books):
+        tree.insert('', 'end', values=row, tags=(row[5],))
 
     # Add scrollbar
     scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
@@ -580,15 +773,12 @@ def show_borrowed_books_view():
                 f.write("Generated on: " + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + "\n\n")
                 f.write("-" * 100 + "\n")
                 
-                for borrowed in borrowed_books:
-                    due_date = datetime.strptime(borrowed['due_date'], '%Y-%m-%d')
-                    status = "Overdue" if today > due_date else "On Time"
-                    
-                    f.write(f"Book ID: {borrowed['book_id']}\n")
-                    f.write(f"Title: {borrowed['book_title']}\n")
-                    f.write(f"Borrowed by: {borrowed['student_name']}\n")
-                    f.write(f"Borrow Date: {borrowed['borrow_date']}\n")
-                    f.write(f"Due Date: {borrowed['due_date']}\n")
+                for book_id, book_title, student_name, borrow_date, due_date, status in cache.borrowed(borrowed_books):
+                    f.write(f"Book ID: {book_id}\n")
+                    f.write(f"Title: {book_title}\n")
+                    f.write(f"Borrowed by: {student_name}\n")
+                    f.write(f"Borrow Date: {borrow_date}\n")
+                    f.write(f"Due Date: {due_date}\n")
                     f.write(f"Status: {status}\n")
                     f.write("-" * 100 + "\n")
             
@@ -669,6 +859,13 @@ def show_edit_book_dialog():
             return
         
         # Update book
+        if not record_mutation('edit_book', {
+            'id': book['id'],
+            'title': title_entry.get(),
+            'author': author_entry.get(),
+            'publication_year': year
+        }):
+            return
         book['title'] = title_entry.get()
         book['author'] = author_entry.get()
         book['publication_year'] = year
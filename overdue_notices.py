@@ -0,0 +1,200 @@
+"""
+Overdue Notice Generator
+
+This module implements a headless batch job that turns the overdue loans in
+borrowed_books.json into one reminder notice per student. It can be run on
+its own from the command line or called from the GUI.
+"""
+
+# Standard library imports
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+# Default locations
+DEFAULT_DATA_FILE = 'borrowed_books.json'
+DEFAULT_OUTPUT_DIR = 'notices'
+DEFAULT_CHECKPOINT_FILE = 'notices_checkpoint.txt'
+
+# Number of students rendered per worker task
+DEFAULT_CHUNK_SIZE = 500
+
+
+class DirectorySink:
+    """Deliver notices as text files in a local directory.
+
+    Any object with a deliver(student_name, notice_key, text) method can be
+    used as a sink, e.g. an SMTP client or an in-memory stand-in.
+    """
+
+    def __init__(self, directory=DEFAULT_OUTPUT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def deliver(self, student_name, notice_key, text):
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', student_name).strip('_') or 'student'
+        path = os.path.join(self.directory, f"{slug}-{notice_key[:8]}.txt")
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+def load_borrowed_books(path=DEFAULT_DATA_FILE):
+    """Load borrowing records from a JSON file"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def find_overdue(borrowed_books, today=None):
+    """Return (record, days_overdue) pairs for loans due before today"""
+    today = today or date.today()
+    today_str = today.strftime('%Y-%m-%d')
+    # Due dates are ISO strings, so a string compare filters without parsing;
+    # each distinct due date is then parsed only once.
+    days_by_due = {}
+    overdue = []
+    for borrowed in borrowed_books:
+        due = borrowed['due_date']
+        if due < today_str:
+            days = days_by_due.get(due)
+            if days is None:
+                days = (today - datetime.strptime(due, '%Y-%m-%d').date()).days
+                days_by_due[due] = days
+            overdue.append((borrowed, days))
+    return overdue
+
+
+def group_by_student(overdue):
+    """Group overdue pairs by borrower, keeping the original order"""
+    groups = {}
+    for borrowed, days in overdue:
+        groups.setdefault(borrowed['student_name'], []).append((borrowed, days))
+    return groups
+
+
+def notice_key(student_name, loans):
+    """Stable identifier for a notice covering exactly these loans"""
+    digest = hashlib.sha1(student_name.encode('utf-8'))
+    for borrowed, _ in sorted(loans, key=lambda item: (item[0]['book_id'], item[0]['due_date'])):
+        digest.update(f"|{borrowed['book_id']}:{borrowed['due_date']}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_notice(student_name, loans, today):
+    """Render the reminder text for one student"""
+    lines = [
+        "LIBRARY OVERDUE NOTICE",
+        f"Date: {today}",
+        "",
+        f"Dear {student_name},",
+        "",
+        "Our records show the following books are overdue:",
+        "",
+    ]
+    for borrowed, days in loans:
+        lines.append(f"  - {borrowed['book_title']} (Book ID: {borrowed['book_id']})")
+        lines.append(f"    Due: {borrowed['due_date']}, {days} days overdue")
+    lines.extend([
+        "",
+        "Please return them to the library as soon as possible.",
+        "",
+        "Library Management System",
+        "",
+    ])
+    return "\n".join(lines)
+
+
+def render_chunk(chunk, today):
+    """Render a list of (student_name, key, loans) jobs in a worker"""
+    return [(student_name, key, render_notice(student_name, loans, today))
+            for student_name, key, loans in chunk]
+
+
+def load_checkpoint(path):
+    """Return the set of notice keys already delivered"""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, 'r') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def generate_notices(borrowed_books, sink, today=None, checkpoint_path=DEFAULT_CHECKPOINT_FILE,
+                     workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Render and deliver one notice per student with overdue books
+
+    Notices already recorded in the checkpoint file are skipped, so the job
+    can be re-run safely. Returns a (produced, skipped) tuple of counts.
+    """
+    today = today or date.today()
+    done = load_checkpoint(checkpoint_path)
+
+    jobs = []
+    skipped = 0
+    for student_name, loans in group_by_student(find_overdue(borrowed_books, today)).items():
+        key = notice_key(student_name, loans)
+        if key in done:
+            skipped += 1
+        else:
+            jobs.append((student_name, key, loans))
+
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    checkpoint = open(checkpoint_path, 'a') if checkpoint_path else None
+    executor = None
+    produced = 0
+    try:
+        if workers == 1 or len(chunks) <= 1:
+            rendered_chunks = (render_chunk(chunk, today) for chunk in chunks)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            rendered_chunks = executor.map(render_chunk, chunks, [today] * len(chunks))
+
+        for rendered in rendered_chunks:
+            for student_name, key, text in rendered:
+                sink.deliver(student_name, key, text)
+                # Record each notice as soon as it is out, so a job that dies
+                # mid-chunk never delivers it again on the next run
+                if checkpoint:
+                    checkpoint.write(key + "\n")
+                    checkpoint.flush()
+                produced += 1
+    finally:
+        if executor:
+            executor.shutdown()
+        if checkpoint:
+            checkpoint.close()
+
+    return produced, skipped
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Generate overdue notices per student.")
+    parser.add_argument('--data', default=DEFAULT_DATA_FILE, help="borrowing records JSON file")
+    parser.add_argument('--out', default=DEFAULT_OUTPUT_DIR, help="directory for notice files")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_FILE,
+                        help="file recording notices already produced")
+    parser.add_argument('--date', help="treat this day (YYYY-MM-DD) as today")
+    parser.add_argument('--workers', type=int, help="number of worker processes")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="students rendered per worker task")
+    args = parser.parse_args()
+
+    today = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else None
+    produced, skipped = generate_notices(
+        load_borrowed_books(args.data),
+        DirectorySink(args.out),
+        today=today,
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+    print(f"Produced {produced} notices, skipped {skipped} already produced.")
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
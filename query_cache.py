@@ -0,0 +1,150 @@
+"""
+Query Result Cache
+
+This module implements the derived data shown by the views (search results,
+status strings, overdue days) together with a small LRU cache
+for it. Cached results are dropped only when a mutation log entry can
+change them, so reopening a view without intervening changes is free.
+"""
+
+# Standard library imports
+import sys
+from collections import OrderedDict
+from datetime import date
+
+# Local imports
+import overdue_notices
+
+# Default memory budget for cached rows
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+def matches_search(book, search_term):
+    """Check whether a book's title or author contains the search term"""
+    term = search_term.lower()
+    return term in book['title'].lower() or term in book['author'].lower()
+
+
+def search_rows(books, search_term=""):
+    """Return (id, title, author, year, status) rows"""
+    return [(book['id'], book['title'], book['author'], book['publication_year'],
+             "Available" if book['available'] else "Borrowed")
+            for book in books if matches_search(book, search_term)]
+
+
+def overdue_rows(borrowed_books, today):
+    """Return (book_id, title, student, due_date, days_overdue) rows"""
+    return [(borrowed['book_id'], borrowed['book_title'], borrowed['student_name'],
+             borrowed['due_date'], days)
+            for borrowed, days in overdue_notices.find_overdue(borrowed_books, today)]
+
+
+def borrowed_rows(borrowed_books, today):
+    """Return (book_id, title, student, borrow_date, due_date, status) rows"""
+    today_str = today.strftime('%Y-%m-%d')
+    return [(borrowed['book_id'], borrowed['book_title'], borrowed['student_name'],
+             borrowed['borrow_date'], borrowed['due_date'],
+             "Overdue" if borrowed['due_date'] < today_str else "On Time")
+            for borrowed in borrowed_books]
+
+
+def estimate_size(rows):
+    """Roughly estimate the memory held by a list of row tuples"""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+def is_affected(key, book_ids, entry):
+    """Check whether a mutation log entry can change a cached result
+
+    Every cached row starts with a book id, so a change to any book in the
+    result always counts. Beyond that, only changes that could bring a new
+    row into the result do.
+    """
+    data = entry['data']
+    if data.get('id', data.get('book_id')) in book_ids:
+        return True
+    kind = key[0]
+    if kind == 'search':
+        return entry['op'] in ('add_book', 'edit_book') and matches_search(data, key[1])
+    if kind == 'overdue':
+        return entry['op'] == 'borrow' and data['due_date'] < key[1]
+    if kind == 'borrowed':
+        return entry['op'] == 'borrow'
+    return True
+
+
+class QueryCache:
+    """LRU cache of view rows within a memory budget"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()    # key -> (rows, book_ids, size)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, compute):
+        """Return cached rows for key, computing and storing them on a miss"""
+        cached = self.entries.get(key)
+        if cached is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return cached[0]
+
+        self.misses += 1
+        rows = compute()
+        size = estimate_size(rows)
+        if size <= self.max_bytes:
+            self.entries[key] = (rows, {row[0] for row in rows}, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+        return rows
+
+    def invalidate(self, entry):
+        """Drop every cached result a mutation log entry can change"""
+        for key in [key for key, (_, book_ids, _) in self.entries.items()
+                    if is_affected(key, book_ids, entry)]:
+            self.size -= self.entries.pop(key)[2]
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop all cached results"""
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        """Return the cache counters for tuning the memory budget"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+        }
+
+    def search(self, books, search_term=""):
+        """Cached search_rows"""
+        return self.get(('search', search_term.lower()),
+                        lambda: search_rows(books, search_term))
+
+    def overdue(self, borrowed_books, today=None):
+        """Cached overdue_rows as of a day"""
+        today = today or date.today()
+        return self.get(('overdue', today.strftime('%Y-%m-%d')),
+                        lambda: overdue_rows(borrowed_books, today))
+
+    def borrowed(self, borrowed_books, today=None):
+        """Cached borrowed_rows as of a day"""
+        today = today or date.today()
+        return self.get(('borrowed', today.strftime('%Y-%m-%d')),
+                        lambda: borrowed_rows(borrowed_books, today))
@@ -0,0 +1,433 @@
+"""
+Catalog Replication
+
+This module implements log-shipping replication for the library catalog.
+The primary appends every mutation to a log file and writes a snapshot of
+the full catalog together with the log offset it corresponds to. Replicas
+bootstrap once from a snapshot and then apply only the new log entries,
+either shipped into a local directory or fetched over a localhost socket.
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import socket
+import socketserver
+import time
+import uuid
+
+# Default locations
+DEFAULT_LOG_FILE = 'mutations.log'
+DEFAULT_SNAPSHOT_FILE = 'snapshot.json'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Operation of the header line that starts every log
+LOG_START_OP = 'start'
+
+# Files kept inside a replica directory
+SHIPPED_STATE_FILE = 'shipped_state.json'
+REPLICA_STATE_FILE = 'replica_state.json'
+
+
+class LogTruncatedError(Exception):
+    """The log is shorter than an offset previously read from it"""
+
+
+class SnapshotMismatchError(Exception):
+    """The snapshot was taken from a different log than the current one"""
+
+
+class MutationLog:
+    """Append-only log of catalog mutations, one JSON object per line
+
+    The first line of every log is a header holding a random log id.
+    Snapshots carry the id of the log they were taken from, so a log that
+    was deleted or replaced is recognised even once it has grown past the
+    offsets replicas remember.
+    """
+
+    def __init__(self, path=DEFAULT_LOG_FILE):
+        self.path = path
+        self.log_id = read_log_id(path) or self.start_new()
+
+    def start_new(self):
+        """Replace the log with an empty one under a new id"""
+        self.log_id = uuid.uuid4().hex
+        header = {'op': LOG_START_OP, 'data': {'log_id': self.log_id}}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+        os.replace(tmp_path, self.path)
+        return self.log_id
+
+    def offset(self):
+        """Return the byte offset just past the last entry"""
+        return log_size(self.path)
+
+    def append(self, op, data):
+        """Append a mutation and return the log entry"""
+        if not os.path.exists(self.path):
+            # Never write entries without a header; the new id tells
+            # shippers the current snapshot no longer matches
+            self.start_new()
+        entry = {'op': op, 'data': data}
+        with open(self.path, 'ab') as f:
+            f.write(json.dumps(entry).encode('utf-8') + b'\n')
+        return entry
+
+
+def log_size(path):
+    """Return the size of a log file, or 0 if it does not exist yet"""
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def read_log_id(path):
+    """Return the id from a log's header line, or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        line = f.readline()
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return None
+    if header.get('op') != LOG_START_OP:
+        return None
+    return header['data']['log_id']
+
+
+def read_matching_snapshot(snapshot_path, log_path):
+    """Load the snapshot, checking it was taken from the current log"""
+    snapshot = read_snapshot(snapshot_path)
+    log_id = read_log_id(log_path)
+    if snapshot['id'] != log_id:
+        raise SnapshotMismatchError(
+            f"'{snapshot_path}' belongs to log {snapshot['id']}, but '{log_path}' is "
+            f"log {log_id}; restart the primary to write a new snapshot")
+    return snapshot
+
+
+def read_log_bytes(path, offset):
+    """Return (data, new_offset) for the complete log lines after offset
+
+    Raises LogTruncatedError if the log no longer reaches offset, e.g.
+    because it was deleted or restored from an older backup.
+    """
+    size = log_size(path)
+    if offset > size:
+        raise LogTruncatedError(f"'{path}' has {size} bytes, expected at least {offset}")
+    if offset == size:
+        return b'', offset
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    # A line still being written has no newline yet; leave it for next time
+    end = data.rfind(b'\n') + 1
+    return data[:end], offset + end
+
+
+def parse_log_bytes(data):
+    """Decode raw log lines into entries"""
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+
+def write_json_atomic(path, value):
+    """Write JSON to a temporary file and move it into place"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(path, books, borrowed_books, offset, snapshot_id):
+    """Save the full catalog with the id and offset of the log it reflects"""
+    write_json_atomic(path, {
+        'id': snapshot_id,
+        'offset': offset,
+        'books': books,
+        'borrowed_books': borrowed_books,
+    })
+
+
+def read_snapshot(path):
+    """Load a snapshot written by write_snapshot"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def apply_mutation(books, borrowed_books, entry):
+    """Apply one log entry to dicts of books by id and loans by book id
+
+    Every operation is idempotent, so an entry applied twice after an
+    interrupted ship leaves the same state.
+    """
+    op = entry['op']
+    data = entry['data']
+    if op == 'add_book':
+        books[data['id']] = dict(data)
+    elif op == 'edit_book':
+        if data['id'] in books:
+            books[data['id']].update(data)
+    elif op == 'delete_book':
+        books.pop(data['id'], None)
+        borrowed_books.pop(data['id'], None)
+    elif op == 'borrow':
+        if data['book_id'] in books:
+            books[data['book_id']]['available'] = False
+        borrowed_books[data['book_id']] = dict(data)
+    elif op == 'return':
+        if data['book_id'] in books:
+            books[data['book_id']]['available'] = True
+        borrowed_books.pop(data['book_id'], None)
+
+
+def open_primary(books, borrowed_books, log_path=DEFAULT_LOG_FILE,
+                 snapshot_path=DEFAULT_SNAPSHOT_FILE):
+    """Open the primary's log and return (log, books, borrowed_books)
+
+    The snapshot from the previous start plus the entries logged since is
+    the authoritative catalog, so a change that was logged but never
+    reached the JSON files (e.g. because saving them failed) is replayed
+    here, exactly as replicas applied it. The JSON catalog passed in is
+    only used when there is no snapshot of the current log. A fresh
+    snapshot is then written for replicas to start from.
+    """
+    log = MutationLog(log_path)
+    snapshot = read_snapshot(snapshot_path) if os.path.exists(snapshot_path) else None
+    if snapshot is not None and snapshot['id'] == log.log_id:
+        if snapshot['offset'] <= log.offset():
+            books_by_id = {book['id']: book for book in snapshot['books']}
+            borrowed_by_id = {b['book_id']: b for b in snapshot['borrowed_books']}
+            data, end = read_log_bytes(log_path, snapshot['offset'])
+            for entry in parse_log_bytes(data):
+                apply_mutation(books_by_id, borrowed_by_id, entry)
+            books = list(books_by_id.values())
+            borrowed_books = list(borrowed_by_id.values())
+            # Drop a line cut short by a crash so new entries start cleanly
+            with open(log_path, 'r+b') as f:
+                f.truncate(end)
+        else:
+            # The log was restored from an older copy; replicas have to
+            # start over together with the JSON catalog
+            log.start_new()
+    write_snapshot(snapshot_path, books, borrowed_books, log.offset(), log.log_id)
+    return log, books, borrowed_books
+
+
+class DirectoryShipper:
+    """Ship the primary's snapshot and log into a replica directory
+
+    The first ship copies the snapshot; every later ship only appends the
+    log bytes written since the previous one. If the primary's log has been
+    replaced (its id changed or it got shorter), the replica directory
+    starts over from the current snapshot.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def ship(self, log_path=DEFAULT_LOG_FILE, snapshot_path=DEFAULT_SNAPSHOT_FILE):
+        state = read_shipped_state(self.directory)
+        local_log = os.path.join(self.directory, DEFAULT_LOG_FILE)
+
+        if (state is not None and state['snapshot_id'] == read_log_id(log_path)
+                and state['offset'] <= log_size(log_path)):
+            data, primary_offset = read_log_bytes(log_path, state['offset'])
+        else:
+            # Start the replica directory over with an empty log of its own
+            snapshot = read_matching_snapshot(snapshot_path, log_path)
+            data, primary_offset = read_log_bytes(log_path, snapshot['offset'])
+            snapshot['offset'] = 0
+            open(local_log, 'wb').close()
+            write_json_atomic(os.path.join(self.directory, DEFAULT_SNAPSHOT_FILE), snapshot)
+            state = {'snapshot_id': snapshot['id']}
+
+        if data:
+            with open(local_log, 'ab') as f:
+                f.write(data)
+        state['offset'] = primary_offset
+        write_json_atomic(os.path.join(self.directory, SHIPPED_STATE_FILE), state)
+
+
+def read_shipped_state(directory):
+    """Return what a DirectoryShipper last shipped, or None"""
+    path = os.path.join(directory, SHIPPED_STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class _LogRequestHandler(socketserver.StreamRequestHandler):
+    """Answer one replica request with log bytes from its offset
+
+    The request is a single line holding a log offset and the id of the
+    snapshot the replica started from, or -1 to ask for the snapshot. The
+    first response line is the snapshot, or null when the replica can
+    continue from its offset. The snapshot is also sent when the log was
+    replaced (different id) or no longer reaches the offset.
+    """
+
+    def handle(self):
+        offset, _, snapshot_id = self.rfile.readline().decode('utf-8').strip().partition(' ')
+        offset = int(offset)
+        log_path = self.server.log_path
+        snapshot = None
+        if (offset < 0 or snapshot_id != read_log_id(log_path)
+                or offset > log_size(log_path)):
+            snapshot = read_matching_snapshot(self.server.snapshot_path, log_path)
+            offset = snapshot['offset']
+        data, _ = read_log_bytes(self.server.log_path, offset)
+        self.wfile.write(json.dumps(snapshot).encode('utf-8') + b'\n' + data)
+
+
+class LogServer(socketserver.ThreadingTCPServer):
+    """Serve the primary's snapshot and log to replicas over TCP"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, log_path=DEFAULT_LOG_FILE, snapshot_path=DEFAULT_SNAPSHOT_FILE,
+                 host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        super().__init__((host, port), _LogRequestHandler)
+
+
+def fetch_from_server(host, port, offset, snapshot_id=None):
+    """Return (snapshot or None, log bytes) from a LogServer"""
+    with socket.create_connection((host, port), timeout=10) as conn:
+        conn.sendall(f"{offset} {snapshot_id or ''}\n".encode('utf-8'))
+        f = conn.makefile('rb')
+        header = f.readline()
+        if not header:
+            raise ConnectionError(f"{host}:{port} closed the connection without a reply")
+        return json.loads(header), f.read()
+
+
+class Replica:
+    """Read-only copy of the catalog kept current from a primary's log
+
+    With no source, the replica reads what a DirectoryShipper wrote into
+    its directory; with a (host, port) source it pulls from a LogServer.
+    Applied state and the log offset are saved in the directory so a
+    restarted replica resumes without copying the catalog again. A cache
+    with an invalidate(entry) method can be attached to follow changes.
+    """
+
+    def __init__(self, directory, source=None, cache=None):
+        self.directory = directory
+        self.source = source
+        self.cache = cache
+        self.books = {}
+        self.borrowed_books = {}
+        self.offset = None
+        self.snapshot_id = None
+        os.makedirs(directory, exist_ok=True)
+
+        state_path = os.path.join(directory, REPLICA_STATE_FILE)
+        if os.path.exists(state_path):
+            self._load(read_snapshot(state_path))
+
+    def _load(self, snapshot):
+        self.books = {book['id']: book for book in snapshot['books']}
+        self.borrowed_books = {b['book_id']: b for b in snapshot['borrowed_books']}
+        self.offset = snapshot['offset']
+        self.snapshot_id = snapshot['id']
+        if self.cache:
+            self.cache.clear()
+
+    def fetch(self):
+        """Read what is new at the source without changing the replica
+
+        Returns (snapshot, data, offset) for apply(). The snapshot is only
+        set when the replica has to start over from it.
+        """
+        if self.source:
+            offset = -1 if self.offset is None else self.offset
+            snapshot, data = fetch_from_server(*self.source, offset, self.snapshot_id)
+            start = snapshot['offset'] if snapshot else offset
+            return snapshot, data, start + len(data)
+
+        shipped = read_shipped_state(self.directory)
+        if shipped is None:
+            return None, b'', self.offset
+        log_path = os.path.join(self.directory, DEFAULT_LOG_FILE)
+        snapshot = None
+        offset = self.offset
+        if (offset is None or shipped['snapshot_id'] != self.snapshot_id
+                or offset > log_size(log_path)):
+            snapshot = read_snapshot(os.path.join(self.directory, DEFAULT_SNAPSHOT_FILE))
+            offset = snapshot['offset']
+        data, offset = read_log_bytes(log_path, offset)
+        return snapshot, data, offset
+
+    def apply(self, snapshot, data, offset):
+        """Apply the result of fetch() and return how many entries it had"""
+        if snapshot:
+            self._load(snapshot)
+        entries = parse_log_bytes(data)
+        for entry in entries:
+            apply_mutation(self.books, self.borrowed_books, entry)
+            if self.cache:
+                self.cache.invalidate(entry)
+        self.offset = offset
+        if entries or snapshot:
+            self.save()
+        return len(entries)
+
+    def pull(self):
+        """Apply new log entries from the source and return how many"""
+        return self.apply(*self.fetch())
+
+    def save(self):
+        """Persist the applied state and log offset"""
+        write_snapshot(os.path.join(self.directory, REPLICA_STATE_FILE),
+                       list(self.books.values()), list(self.borrowed_books.values()),
+                       self.offset, self.snapshot_id)
+
+
+def parse_address(value):
+    """Parse HOST:PORT into a (host, port) tuple"""
+    host, _, port = value.rpartition(':')
+    return host or DEFAULT_HOST, int(port)
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Replicate the library catalog.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help="serve the primary's log over TCP")
+    serve.add_argument('--address', default=f"{DEFAULT_HOST}:{DEFAULT_PORT}", help="HOST:PORT")
+
+    ship = subparsers.add_parser('ship', help="ship the primary's log into replica directories")
+    ship.add_argument('directories', nargs='+')
+
+    pull = subparsers.add_parser('pull', help="bring a replica directory up to date")
+    pull.add_argument('directory')
+    pull.add_argument('--primary', help="HOST:PORT of a log server")
+    pull.add_argument('--follow', type=float, metavar='SECONDS', help="keep pulling at this interval")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        host, port = parse_address(args.address)
+        with LogServer(host=host, port=port) as server:
+            server.serve_forever()
+    elif args.command == 'ship':
+        for directory in args.directories:
+            DirectoryShipper(directory).ship()
+    elif args.command == 'pull':
+        replica = Replica(args.directory, parse_address(args.primary) if args.primary else None)
+        while True:
+            applied = replica.pull()
+            print(f"Applied {applied} entries, offset {replica.offset}.")
+            if not args.follow:
+                break
+            time.sleep(args.follow)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Tests for the overdue notice batch job
+
+Run with: python -m unittest test_overdue_notices
+"""
+
+# Standard library imports
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+# Local imports
+import overdue_notices
+
+
+TODAY = date(2025, 1, 1)
+BORROWED_BOOKS = [
+    {'book_id': 2, 'book_title': "Dune", 'student_name': "Emma Wilson",
+     'borrow_date': "2024-11-14", 'due_date': "2024-11-28"},
+    {'book_id': 1, 'book_title': "The Hobbit", 'student_name': "Omar",
+     'borrow_date': "2024-12-01", 'due_date': "2024-12-15"},
+    {'book_id': 3, 'book_title': "Emma", 'student_name': "Sara",
+     'borrow_date': "2024-12-05", 'due_date': "2024-12-19"},
+    {'book_id': 4, 'book_title': "Ulysses", 'student_name': "Lina",
+     'borrow_date': "2024-12-30", 'due_date': "2025-01-13"},
+]
+
+
+class MemorySink:
+    """Keep delivered notices in a list, optionally failing after a few"""
+
+    def __init__(self, fail_after=None):
+        self.delivered = []
+        self.fail_after = fail_after
+
+    def deliver(self, student_name, notice_key, text):
+        if self.fail_after is not None and len(self.delivered) >= self.fail_after:
+            raise IOError("sink unavailable")
+        self.delivered.append((student_name, notice_key, text))
+
+    def keys(self):
+        return [key for _, key, _ in self.delivered]
+
+
+class GenerateNoticesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.tmp, 'checkpoint.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def generate(self, sink, borrowed_books=BORROWED_BOOKS, chunk_size=10):
+        return overdue_notices.generate_notices(
+            borrowed_books, sink, today=TODAY, checkpoint_path=self.checkpoint_path,
+            workers=1, chunk_size=chunk_size)
+
+    def test_one_notice_per_overdue_student(self):
+        sink = MemorySink()
+        self.assertEqual(self.generate(sink), (3, 0))
+        self.assertEqual([name for name, _, _ in sink.delivered], ["Emma Wilson", "Omar", "Sara"])
+        self.assertIn("Due: 2024-11-28, 34 days overdue", sink.delivered[0][2])
+        self.assertEqual(overdue_notices.load_checkpoint(self.checkpoint_path), set(sink.keys()))
+
+    def test_rerun_delivers_nothing(self):
+        self.generate(MemorySink())
+        sink = MemorySink()
+        self.assertEqual(self.generate(sink), (0, 3))
+        self.assertEqual(sink.delivered, [])
+
+    def test_new_overdue_loan_gives_new_notice(self):
+        first = MemorySink()
+        self.generate(first)
+
+        # Another overdue book for a student who already had a notice
+        borrowed_books = BORROWED_BOOKS + [
+            {'book_id': 5, 'book_title': "Emma", 'student_name': "Omar",
+             'borrow_date': "2024-12-02", 'due_date': "2024-12-16"},
+        ]
+        sink = MemorySink()
+        self.assertEqual(self.generate(sink, borrowed_books), (1, 2))
+        self.assertEqual(sink.delivered[0][0], "Omar")
+        self.assertNotIn(sink.keys()[0], first.keys())
+        self.assertIn("Emma (Book ID: 5)", sink.delivered[0][2])
+
+    def test_sink_failure_keeps_only_delivered_keys(self):
+        sink = MemorySink(fail_after=2)
+        with self.assertRaises(IOError):
+            self.generate(sink)
+        self.assertEqual(len(sink.delivered), 2)
+        self.assertEqual(overdue_notices.load_checkpoint(self.checkpoint_path), set(sink.keys()))
+
+        # The next run delivers only the notice that failed
+        retry = MemorySink()
+        self.assertEqual(self.generate(retry), (1, 2))
+        self.assertEqual([name for name, _, _ in retry.delivered], ["Sara"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+"""
+Tests for the query result cache
+
+Run with: python -m unittest test_query_cache
+"""
+
+# Standard library imports
+import unittest
+from datetime import date
+
+# Local imports
+import query_cache
+
+
+TODAY = date(2025, 1, 1)
+BOOKS = [
+    {'id': 1, 'title': "The Hobbit", 'author': "J.R.R. Tolkien",
+     'publication_year': "1937", 'available': True},
+    {'id': 2, 'title': "Dune", 'author': "Frank Herbert",
+     'publication_year': "1965", 'available': False},
+    {'id': 3, 'title': "Emma", 'author': "Jane Austen",
+     'publication_year': "1815", 'available': True},
+]
+BORROWED_BOOKS = [
+    {'book_id': 2, 'book_title': "Dune", 'student_name': "Emma Wilson",
+     'borrow_date': "2024-11-14", 'due_date': "2024-11-28"},
+]
+
+
+def edit(book_id, title, author):
+    return {'op': 'edit_book', 'data': {'id': book_id, 'title': title, 'author': author,
+                                        'publication_year': "2000"}}
+
+
+class QueryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = query_cache.QueryCache()
+
+    def fill(self):
+        """Cache a search for "dune", the borrowed list and the overdue list"""
+        self.cache.search(BOOKS, "dune")
+        self.cache.borrowed(BORROWED_BOOKS, TODAY)
+        self.cache.overdue(BORROWED_BOOKS, TODAY)
+
+    def cached_kinds(self):
+        return sorted(key[0] for key in self.cache.entries)
+
+    def test_repeated_query_is_a_hit(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return query_cache.search_rows(BOOKS, "tolkien")
+
+        first = self.cache.get(('search', "tolkien"), compute)
+        second = self.cache.get(('search', "tolkien"), compute)
+        self.assertIs(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        # Search is case-insensitive, so the key is too
+        self.cache.search(BOOKS, "TOLKIEN")
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_edit_that_starts_matching_drops_search(self):
+        self.fill()
+        self.cache.invalidate(edit(1, "Dune Messiah", "Frank Herbert"))
+        self.assertEqual(self.cached_kinds(), ['borrowed', 'overdue'])
+
+    def test_edit_that_stops_matching_drops_search(self):
+        self.cache.search(BOOKS, "dune")
+        self.cache.search(BOOKS, "austen")
+        self.cache.invalidate(edit(2, "Children of Dune", "Frank Herbert"))
+        self.cache.invalidate(edit(3, "Persuasion", "Someone Else"))
+        self.assertEqual(list(self.cache.entries), [])
+        self.assertEqual(self.cache.invalidations, 2)
+
+    def test_return_drops_results_containing_the_book(self):
+        self.fill()
+        self.cache.invalidate({'op': 'return', 'data': {'book_id': 2}})
+        self.assertEqual(list(self.cache.entries), [])
+        self.assertEqual(self.cache.stats()['bytes'], 0)
+
+    def test_borrow_drops_results_containing_the_book(self):
+        self.cache.search(BOOKS, "hobbit")
+        self.cache.search(BOOKS, "austen")
+        self.cache.borrowed(BORROWED_BOOKS, TODAY)
+        self.cache.overdue(BORROWED_BOOKS, TODAY)
+        borrow = {'book_id': 1, 'book_title': "The Hobbit", 'student_name': "Omar",
+                  'borrow_date': "2024-12-01", 'due_date': "2024-12-15"}
+        self.cache.invalidate({'op': 'borrow', 'data': borrow})
+        self.assertEqual(list(self.cache.entries), [('search', "austen")])
+
+    def test_unrelated_mutations_keep_results(self):
+        self.fill()
+        self.cache.search(BOOKS, "austen")
+        before = list(self.cache.entries)
+
+        # Not in any result, and none of them could come to include it
+        self.cache.invalidate({'op': 'add_book', 'data': {
+            'id': 4, 'title': "Ulysses", 'author': "James Joyce",
+            'publication_year': "1922", 'available': True}})
+        self.cache.invalidate(edit(1, "The Hobbit", "Tolkien"))
+        self.cache.invalidate({'op': 'return', 'data': {'book_id': 1}})
+        self.cache.invalidate({'op': 'delete_book', 'data': {'id': 1}})
+        self.assertEqual(list(self.cache.entries), before)
+
+        # A new loan that is not yet due leaves the overdue list and other
+        # searches alone; only the borrowed list and the search showing
+        # the book's status change
+        self.cache.invalidate({'op': 'borrow', 'data': {
+            'book_id': 3, 'book_title': "Emma", 'student_name': "Omar",
+            'borrow_date': "2024-12-30", 'due_date': "2025-01-13"}})
+        self.assertEqual(list(self.cache.entries),
+                         [('search', "dune"), ('overdue', "2025-01-01")])
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_lru_eviction_within_budget(self):
+        sizes = {term: query_cache.estimate_size(query_cache.search_rows(BOOKS, term))
+                 for term in ("hobbit", "dune", "emma")}
+        self.cache = query_cache.QueryCache(max_bytes=sizes["hobbit"] + sizes["dune"])
+
+        self.cache.search(BOOKS, "hobbit")
+        self.cache.search(BOOKS, "dune")
+        self.cache.search(BOOKS, "hobbit")    # now the most recently used
+        self.cache.search(BOOKS, "emma")
+
+        self.assertEqual(list(self.cache.entries), [('search', "hobbit"), ('search', "emma")])
+        stats = self.cache.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['bytes'], sizes["hobbit"] + sizes["emma"])
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+
+    def test_result_larger_than_budget_is_not_kept(self):
+        self.cache = query_cache.QueryCache(max_bytes=1)
+        self.assertEqual(len(self.cache.search(BOOKS, "")), 3)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+        self.assertEqual(self.cache.stats()['bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+"""
+Tests for catalog replication
+
+Run with: python -m unittest test_replication
+"""
+
+# Standard library imports
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+# Local imports
+import replication
+
+
+BOOKS = [
+    {'id': 1, 'title': "The Hobbit", 'author': "J.R.R. Tolkien",
+     'publication_year': "1937", 'available': True},
+    {'id': 2, 'title': "Dune", 'author': "Frank Herbert",
+     'publication_year': "1965", 'available': False},
+]
+BORROWED_BOOKS = [
+    {'book_id': 2, 'book_title': "Dune", 'student_name': "Emma Wilson",
+     'borrow_date': "2024-11-14", 'due_date': "2024-11-28"},
+]
+BORROW_HOBBIT = {'book_id': 1, 'book_title': "The Hobbit", 'student_name': "Omar",
+                 'borrow_date': "2024-12-01", 'due_date': "2024-12-15"}
+
+
+class ReplicationTestCase(unittest.TestCase):
+    """Primary files in a temporary directory with a fresh snapshot"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.tmp, 'mutations.log')
+        self.snapshot_path = os.path.join(self.tmp, 'snapshot.json')
+        self.log = replication.MutationLog(self.log_path)
+        self.write_snapshot()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def write_snapshot(self, books=BOOKS, borrowed_books=BORROWED_BOOKS):
+        replication.write_snapshot(self.snapshot_path, books, borrowed_books,
+                                   self.log.offset(), self.log.log_id)
+
+    def reset_primary_log(self, books):
+        """Replace the primary's log and snapshot, as a restore would"""
+        os.remove(self.log_path)
+        self.log = replication.MutationLog(self.log_path)
+        self.write_snapshot(books, [])
+
+    def grow_past(self, offset):
+        """Append harmless entries until the log is longer than offset"""
+        while self.log.offset() <= offset:
+            self.log.append('edit_book', {'id': 1, 'title': "The Hobbit",
+                                          'author': "J.R.R. Tolkien", 'publication_year': "1937"})
+
+
+class OpenPrimaryTest(ReplicationTestCase):
+
+    def test_replays_change_missing_from_json(self):
+        # The borrow was logged, then saving the JSON files failed
+        self.log.append('borrow', BORROW_HOBBIT)
+        log, books, borrowed_books = replication.open_primary(
+            BOOKS, BORROWED_BOOKS, self.log_path, self.snapshot_path)
+        self.assertFalse(books[0]['available'])
+        self.assertEqual([b['book_id'] for b in borrowed_books], [2, 1])
+        self.assertEqual(log.log_id, self.log.log_id)
+
+        snapshot = replication.read_snapshot(self.snapshot_path)
+        self.assertEqual(snapshot['offset'], log.offset())
+        self.assertEqual(snapshot['borrowed_books'], borrowed_books)
+
+    def test_uses_json_without_snapshot_of_this_log(self):
+        os.remove(self.snapshot_path)
+        log, books, borrowed_books = replication.open_primary(
+            BOOKS, [], self.log_path, self.snapshot_path)
+        self.assertEqual((books, borrowed_books), (BOOKS, []))
+        self.assertEqual(replication.read_snapshot(self.snapshot_path)['id'], log.log_id)
+
+    def test_restored_shorter_log_starts_over(self):
+        self.log.append('borrow', BORROW_HOBBIT)
+        self.write_snapshot()
+        with open(self.log_path, 'r+b') as f:
+            f.truncate(self.log.offset() - 1)
+        log, books, _ = replication.open_primary(BOOKS, [], self.log_path, self.snapshot_path)
+        self.assertNotEqual(log.log_id, self.log.log_id)
+        self.assertEqual(books, BOOKS)
+
+    def test_drops_partial_last_line(self):
+        self.log.append('borrow', BORROW_HOBBIT)
+        complete = self.log.offset()
+        with open(self.log_path, 'ab') as f:
+            f.write(b'{"op": "return", "da')
+        log, _, _ = replication.open_primary(BOOKS, BORROWED_BOOKS, self.log_path, self.snapshot_path)
+        self.assertEqual(log.offset(), complete)
+
+
+class DirectoryReplicationTest(ReplicationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.shipper = replication.DirectoryShipper(self.path('replica'))
+
+    def ship(self):
+        self.shipper.ship(self.log_path, self.snapshot_path)
+
+    def test_ship_then_pull(self):
+        self.ship()
+        replica = replication.Replica(self.path('replica'))
+        self.assertEqual(replica.pull(), 0)
+        self.assertEqual(sorted(replica.books), [1, 2])
+
+        self.log.append('borrow', BORROW_HOBBIT)
+        self.log.append('return', {'book_id': 2})
+        self.ship()
+        self.assertEqual(replica.pull(), 2)
+        self.assertFalse(replica.books[1]['available'])
+        self.assertTrue(replica.books[2]['available'])
+        self.assertEqual(list(replica.borrowed_books), [1])
+
+    def test_restart_resumes_from_offset(self):
+        self.ship()
+        replica = replication.Replica(self.path('replica'))
+        self.log.append('delete_book', {'id': 2})
+        self.ship()
+        self.assertEqual(replica.pull(), 1)
+
+        restarted = replication.Replica(self.path('replica'))
+        self.assertEqual(restarted.offset, replica.offset)
+        self.assertEqual(restarted.pull(), 0)
+        self.assertNotIn(2, restarted.books)
+
+        self.log.append('edit_book', {'id': 1, 'title': "The Hobbit (Illustrated)",
+                                      'author': "J.R.R. Tolkien", 'publication_year': 1937})
+        self.ship()
+        self.assertEqual(restarted.pull(), 1)
+        self.assertEqual(restarted.books[1]['title'], "The Hobbit (Illustrated)")
+
+    def test_replaced_primary_log_starts_over(self):
+        self.log.append('borrow', BORROW_HOBBIT)
+        self.ship()
+        replica = replication.Replica(self.path('replica'))
+        replica.pull()
+
+        self.reset_primary_log([BOOKS[0]])
+        self.log.append('delete_book', {'id': 1})
+        self.ship()
+        replica.pull()
+        self.assertEqual(replica.books, {})
+        self.assertEqual(replica.borrowed_books, {})
+
+    def test_replaced_primary_log_longer_than_offset_starts_over(self):
+        self.log.append('borrow', BORROW_HOBBIT)
+        self.ship()
+        replica = replication.Replica(self.path('replica'))
+        replica.pull()
+        old_offset = replica.offset
+
+        self.reset_primary_log([BOOKS[0]])
+        self.log.append('delete_book', {'id': 1})
+        self.log.append('add_book', dict(BOOKS[1], available=True))
+        self.grow_past(old_offset)
+        self.ship()
+        replica.pull()
+        self.assertEqual(list(replica.books), [2])
+        self.assertTrue(replica.books[2]['available'])
+        self.assertEqual(replica.borrowed_books, {})
+
+        # The replica directory holds only whole entries of the new log
+        self.log.append('return', {'book_id': 2})
+        self.ship()
+        self.assertEqual(replication.Replica(self.path('replica')).pull(), 1)
+
+    def test_restarted_primary_keeps_replica_offset(self):
+        self.ship()
+        replica = replication.Replica(self.path('replica'))
+        replica.pull()
+
+        # Reopening the same log and rewriting the snapshot is not a reset
+        self.log = replication.MutationLog(self.log_path)
+        self.write_snapshot()
+        self.log.append('borrow', BORROW_HOBBIT)
+        self.ship()
+        self.assertEqual(replica.fetch()[0], None)
+        self.assertEqual(replica.pull(), 1)
+
+    def test_truncated_log_raises(self):
+        self.log.append('borrow', BORROW_HOBBIT)
+        with self.assertRaises(replication.LogTruncatedError):
+            replication.read_log_bytes(self.log_path, self.log.offset() + 1)
+
+
+class SocketReplicationTest(ReplicationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = replication.LogServer(self.log_path, self.snapshot_path, port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.source = self.server.server_address
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def test_pull_and_restart(self):
+        replica = replication.Replica(self.path('replica'), self.source)
+        self.assertEqual(replica.pull(), 0)
+        self.assertEqual(sorted(replica.books), [1, 2])
+
+        self.log.append('borrow', BORROW_HOBBIT)
+        self.assertEqual(replica.pull(), 1)
+        self.assertEqual(replica.offset, self.log.offset())
+
+        restarted = replication.Replica(self.path('replica'), self.source)
+        self.log.append('return', {'book_id': 1})
+        self.assertEqual(restarted.pull(), 1)
+        self.assertTrue(restarted.books[1]['available'])
+
+    def test_replaced_primary_log_starts_over(self):
+        self.log.append('borrow', BORROW_HOBBIT)
+        replica = replication.Replica(self.path('replica'), self.source)
+        replica.pull()
+
+        self.reset_primary_log([BOOKS[0]])
+        self.log.append('delete_book', {'id': 1})
+        replica.pull()
+        self.assertEqual(replica.books, {})
+        self.assertEqual(replica.borrowed_books, {})
+
+    def test_replaced_primary_log_longer_than_offset_starts_over(self):
+        self.log.append('borrow', BORROW_HOBBIT)
+        replica = replication.Replica(self.path('replica'), self.source)
+        replica.pull()
+        old_offset = replica.offset
+
+        self.reset_primary_log([BOOKS[0]])
+        self.log.append('delete_book', {'id': 1})
+        self.log.append('add_book', dict(BOOKS[1], available=True))
+        self.grow_past(old_offset)
+        replica.pull()
+        self.assertEqual(list(replica.books), [2])
+        self.assertEqual(replica.borrowed_books, {})
+        self.assertEqual(replica.offset, self.log.offset())
+
+    def test_snapshot_from_other_log_is_refused(self):
+        os.remove(self.log_path)
+        self.log.append('borrow', BORROW_HOBBIT)
+        replica = replication.Replica(self.path('replica'), self.source)
+        with self.assertRaises(ConnectionError):
+            replica.pull()
+
+
+if __name__ == '__main__':
+    unittest.main()